@@ -1,195 +1,501 @@
-import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+import logging
 from pathlib import Path
+import queue
+import threading
 import time
-import requests
+import numpy as np
 import csv
 
+from power_client import (
+    POWER_BASE,
+    POWER_PARAMS,
+    POWER_REGIONAL_BASE,
+    SESSION,
+    TIMEOUT_SEC,
+    build_t2m_tensor,
+    extract_t2m,
+    fetch_point,
+    fetch_point_raw,
+    json_dumps_bytes,
+    json_loads,
+    point_params,
+    t2m_vector,
+    wi_and_zone_from_tensor,
+)
+
+try:
+    import aiohttp
+except ImportError:  # aiohttpが無い環境では逐次フェッチにフォールバック
+    aiohttp = None
+
 # 設定（広域 + 高解像度は非常に時間がかかります。まずは小さい範囲で検証推奨）
 YEARS = [1992, 1993, 1994, 1995, 1996, 1997, 1998, 1999, 2000, 2001, 2002, 2003, 2004, 2005, 2006, 2007, 2008, 2009, 2010, 2011, 2012, 2013, 2014, 2015, 2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024]
 # 日本全国（概略）：沖縄〜北海道まで（国外は極力含めない範囲）
 LAT_MIN, LAT_MAX = 24.0, 46.0
 LON_MIN, LON_MAX = 123.0, 146.0
 STEP = 0.5  # degrees
-REQUEST_SLEEP_SEC = 0.5  # レート制御（POWER API配慮）
-TIMEOUT_SEC = 30
+ASYNC_CONCURRENCY = 32  # 同時インフライト数の上限
+THREAD_POOL_WORKERS = 16  # requestsフォールバック時のスレッド数
+MAX_FETCH_ATTEMPTS = 5
 CACHE_DIR = Path("cache/power_T2M")
-VERBOSE = True
+# 点単位キャッシュ（解析済みfloat32列）。ベクトル長と年の対応がYEARSに
+# 依存するため、旧JSONキャッシュ同様ファイル名に対象年レンジを含める
+NPZ_CACHE_FILE = CACHE_DIR / f"T2M_grid_{YEARS[0]}_{YEARS[-1]}.npz"
 FAIL_LOG = Path("fetch_failures_kanto.csv")
 
-POWER_BASE = "https://power.larc.nasa.gov/api/temporal/monthly/point"
-POWER_PARAMS = {
-    "parameters": "T2M",
-    "community": "SB",
-    "format": "JSON",
-}
+# 点単位の詳細はDEBUGに落とす。printはstdoutロックを奪い合い、
+# 並列フェッチ時に本来の処理を上回るボトルネックになるため。
+logger = logging.getLogger(__name__)
+
+USE_REGIONAL = True  # regionalエンドポイントで一括取得（点単位は補完用）
+REGION_TILE_DEG = 10.0  # POWER regionalの面積上限に収まるタイルサイズ
+POWER_CELL_DEG = 0.5  # point APIが内部でスナップするネイティブ格子の間隔
+
+
+def snap_to_cell(v: float) -> float:
+    """要求座標をPOWERネイティブ格子のセル中心へスナップ。"""
+    return round(round(v / POWER_CELL_DEG) * POWER_CELL_DEG, 1)
+
+
+def _cache_path(lat: float, lon: float, start_year: int, end_year: int) -> Path:
+    return CACHE_DIR / f"T2M_{lat:.1f}_{lon:.1f}_{start_year}_{end_year}.json"
+
+
+def _cache_load(cache_file: Path):
+    """キャッシュJSONを読む。壊れている/無い場合はNone。"""
+    if not cache_file.exists():
+        return None
+    try:
+        return json_loads(cache_file.read_bytes())
+    except Exception:
+        return None
+
+
+def _cache_store(cache_file: Path, data: dict):
+    cache_file.write_bytes(json_dumps_bytes(data))
+
+
+# 解析済みT2Mベクトルを1つのNPZにまとめたキャッシュ。
+# テキストJSONを毎回トークナイズする代わりに、float32列のロードで済ませる。
+_NPZ_LOCK = threading.Lock()
+_npz_store = None
+_npz_dirty = False
+
+
+def _npz_key(lat: float, lon: float) -> str:
+    return f"{lat:.1f}_{lon:.1f}"
+
+
+def _npz_load() -> dict:
+    global _npz_store
+    if _npz_store is None:
+        _npz_store = {}
+        if NPZ_CACHE_FILE.exists():
+            try:
+                with np.load(NPZ_CACHE_FILE) as f:
+                    _npz_store = {k: f[k] for k in f.files}
+            except Exception:
+                _npz_store = {}
+    return _npz_store
+
+
+def cache_get_vector(lat: float, lon: float):
+    with _NPZ_LOCK:
+        return _npz_load().get(_npz_key(lat, lon))
+
+
+def cache_put_vector(lat: float, lon: float, vec: np.ndarray):
+    global _npz_dirty
+    with _NPZ_LOCK:
+        _npz_load()[_npz_key(lat, lon)] = vec
+        _npz_dirty = True
+
+
+def flush_vector_cache():
+    """更新があればNPZキャッシュをディスクへ書き戻す。"""
+    global _npz_dirty
+    with _NPZ_LOCK:
+        if _npz_dirty and _npz_store:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(NPZ_CACHE_FILE, **_npz_store)
+            _npz_dirty = False
+
+
+def _t2m_vec(t2m) -> np.ndarray:
+    """共通のt2m_vectorを本スクリプトの対象年レンジで呼ぶ。"""
+    return t2m_vector(t2m or {}, YEARS[0], YEARS[-1])
 
 
 def fetch_power_t2m(lat: float, lon: float, start_year: int, end_year: int):
-    """NASA POWER APIから指定点の月平均気温(T2M)を取得。キャッシュ使用。"""
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    cache_file = CACHE_DIR / f"T2M_{lat:.1f}_{lon:.1f}_{start_year}_{end_year}.json"
-    if cache_file.exists():
+    """NASA POWER APIから指定点の月平均気温(T2M)を取得。旧JSONキャッシュは読み取りのみ。"""
+    data = _cache_load(_cache_path(lat, lon, start_year, end_year))
+    if data is not None:
+        logger.debug("CACHE HIT lat=%.1f lon=%.1f", lat, lon)
+        return data
+
+    try:
+        data = fetch_point(lat, lon, start_year, end_year)
+        logger.debug("FETCH lat=%.1f lon=%.1f ok", lat, lon)
+        return data
+    except Exception as e:
+        logger.debug("ERROR FETCH lat=%.1f lon=%.1f err=%s", lat, lon, e)
+        raise
+
+
+def fetch_t2m_vector(lat: float, lon: float, start_year: int, end_year: int) -> np.ndarray:
+    """1地点分のT2Mベクトルを取得。NPZ→旧JSONキャッシュ→HTTPの順で解決。
+
+    NPZストアはメモリ上の辞書なので、同一地点の再参照は辞書引きで返る
+    （プロセス内メモ化を兼ねる）。
+    """
+    vec = cache_get_vector(lat, lon)
+    if vec is not None:
+        return vec
+    power = fetch_power_t2m(lat, lon, start_year, end_year)
+    vec = _t2m_vec(extract_t2m(power))
+    cache_put_vector(lat, lon, vec)
+    return vec
+
+
+class TokenBucket:
+    """X-RateLimit-*ヘッダを反映するトークンバケット型レート制御。"""
+
+    def __init__(self, rate_per_sec: float = 10.0, burst: int = ASYNC_CONCURRENCY):
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1.0:
+                wait = (1.0 - self.tokens) / self.rate
+                self.tokens = 0.0
+                await asyncio.sleep(wait)
+            else:
+                self.tokens -= 1.0
+
+    def update_from_headers(self, headers):
+        """レスポンスのX-RateLimit-Remaining/Resetに合わせて払い出し速度を調整。"""
         try:
-            data = json.loads(cache_file.read_text(encoding="utf-8"))
-            if VERBOSE:
-                print(f"CACHE HIT lat={lat:.1f} lon={lon:.1f}")
-            return data
-        except Exception:
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            if remaining is not None and reset is not None:
+                remaining = float(remaining)
+                window = max(float(reset) - time.time(), 1.0)
+                self.rate = max(remaining / window, 0.5)
+        except (TypeError, ValueError):
             pass
 
+
+async def _fetch_one_async(session, sem, limiter, lat, lon, start_year, end_year):
+    """1地点を非同期取得。429/5xxは指数バックオフ（Retry-After優先）で再試行。"""
+    vec = cache_get_vector(lat, lon)
+    if vec is not None:
+        return lat, lon, vec, None
+    data = _cache_load(_cache_path(lat, lon, start_year, end_year))
+    if data is not None:
+        vec = _t2m_vec(extract_t2m(data))
+        cache_put_vector(lat, lon, vec)
+        return lat, lon, vec, None
+
+    params = point_params(lat, lon, start_year, end_year)
+    last_err = "unknown"
+    for attempt in range(MAX_FETCH_ATTEMPTS):
+        await limiter.acquire()
+        try:
+            async with sem:
+                async with session.get(
+                    POWER_BASE, params=params,
+                    timeout=aiohttp.ClientTimeout(total=TIMEOUT_SEC),
+                ) as r:
+                    limiter.update_from_headers(r.headers)
+                    if r.status in (429, 500, 502, 503, 504):
+                        last_err = f"status_{r.status}"
+                        delay = 0.5 * 2 ** attempt
+                        retry_after = r.headers.get("Retry-After")
+                        if retry_after is not None:
+                            try:
+                                delay = float(retry_after)
+                            except ValueError:
+                                pass  # HTTP-date形式は指数バックオフで代替
+                        await asyncio.sleep(delay)
+                        continue
+                    r.raise_for_status()
+                    try:
+                        data = json_loads(await r.read())
+                    except ValueError:
+                        # 200でもHTMLエラーページ等が返ることがある。
+                        # 1点の解析失敗で全体のrunを落とさずCSVに記録する
+                        return lat, lon, None, "error:JSONDecodeError"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            last_err = f"error:{e.__class__.__name__}"
+            await asyncio.sleep(0.5 * 2 ** attempt)
+            continue
+        vec = _t2m_vec(extract_t2m(data))
+        cache_put_vector(lat, lon, vec)
+        return lat, lon, vec, None
+    return lat, lon, None, last_err
+
+
+async def _fetch_all_async(points, start_year, end_year):
+    """全地点を有界並列で取得し、(lat, lon, vec|None, note|None) のリストを返す。"""
+    sem = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    limiter = TokenBucket()
+    connector = aiohttp.TCPConnector(limit_per_host=64)
+    async with aiohttp.ClientSession(
+        connector=connector, headers={"User-Agent": "climate-fetcher/1.0"}
+    ) as session:
+        tasks = [
+            _fetch_one_async(session, sem, limiter, lat, lon, start_year, end_year)
+            for lat, lon in points
+        ]
+        results = []
+        done = 0
+        start_ts = time.time()
+        for fut in asyncio.as_completed(tasks):
+            results.append(await fut)
+            done += 1
+            if done % 50 == 0 or done == len(tasks):
+                elapsed = time.time() - start_ts
+                rate = done / elapsed if elapsed > 0 else 0.0
+                print(f"Fetched: {done}/{len(tasks)}  rate {rate:6.1f} pts/s", end="\r", flush=True)
+        print()
+        return results
+
+
+def iter_region_tiles(lat_min, lat_max, lon_min, lon_max, size=REGION_TILE_DEG):
+    """対象bboxをregional APIの面積上限に収まるタイルへ分割するジェネレータ。"""
+    lat0 = lat_min
+    while lat0 < lat_max:
+        lon0 = lon_min
+        while lon0 < lon_max:
+            yield lat0, min(lat0 + size, lat_max), lon0, min(lon0 + size, lon_max)
+            lon0 += size
+        lat0 += size
+
+
+def fetch_power_t2m_region(lat_min, lat_max, lon_min, lon_max, start_year, end_year):
+    """regional APIでbbox内の全セルのT2Mを一括取得。タイル単位でキャッシュ。"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_file = CACHE_DIR / f"region_{lat_min:.1f}_{lon_min:.1f}_{start_year}_{end_year}.json"
+    data = _cache_load(cache_file)
+    if data is not None:
+        logger.debug("CACHE HIT region lat0=%.1f lon0=%.1f", lat_min, lon_min)
+        return data
+
     params = {
         **POWER_PARAMS,
-        "longitude": lon,
-        "latitude": lat,
+        "latitude-min": lat_min,
+        "latitude-max": lat_max,
+        "longitude-min": lon_min,
+        "longitude-max": lon_max,
         "start": start_year,
         "end": end_year,
     }
-    url = POWER_BASE
-    try:
-        r = requests.get(url, params=params, timeout=TIMEOUT_SEC, headers={"User-Agent": "climate-fetcher/1.0"})
-        status = r.status_code
-        if VERBOSE:
-            print(f"FETCH lat={lat:.1f} lon={lon:.1f} status={status} url={r.url}")
-        r.raise_for_status()
-        data = r.json()
-        cache_file.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
-        time.sleep(REQUEST_SLEEP_SEC)
-        return data
-    except Exception as e:
-        if VERBOSE:
-            print(f"ERROR FETCH lat={lat:.1f} lon={lon:.1f} err={e}")
-        raise
+    r = SESSION.get(POWER_REGIONAL_BASE, params=params, timeout=TIMEOUT_SEC * 4)
+    logger.debug("FETCH region lat=%.1f..%.1f lon=%.1f..%.1f status=%s",
+                 lat_min, lat_max, lon_min, lon_max, r.status_code)
+    r.raise_for_status()
+    data = json_loads(r.content)
+    _cache_store(cache_file, data)
+    return data
 
 
-def calculate_wi_from_monthly(monthly: dict) -> float:
-    """月平均気温から温量指数（sum(max(T-5,0)))を算出。"""
-    wi = 0.0
-    for temp in monthly.values():
-        if temp is not None and temp > 5.0:
-            wi += (temp - 5.0)
-    return round(wi, 1)
-
-
-def process_yearly_from_power(power_json: dict) -> dict:
-    """POWERレスポンスから年ごとのWIを作成。{year: wi} を返す。"""
-    if not power_json or "properties" not in power_json or "parameter" not in power_json["properties"]:
-        if VERBOSE:
-            keys = list(power_json.keys()) if isinstance(power_json, dict) else type(power_json)
-            print(f"INVALID JSON STRUCT keys={keys}")
-        return {}
-    t2m = power_json["properties"]["parameter"].get("T2M", {})
-    by_year = {y: {} for y in YEARS}
-    for ym, temp in t2m.items():
+def _fetch_all_regional(points, start_year, end_year):
+    """タイル状のregionalリクエストで全地点分を取得。戻り値は点単位版と同形式。
+
+    regionalのレスポンスはGeoJSONのFeatureCollectionで、各featureが
+    POWERネイティブグリッド1セル分のT2M辞書を持つ。featureを座標で
+    引けるよう索引化し、要求グリッドへ割り当てる。未カバーの点は
+    点単位の並列フェッチで補完する。
+    """
+    by_cell = {}
+    for lat0, lat1, lon0, lon1 in iter_region_tiles(LAT_MIN, LAT_MAX, LON_MIN, LON_MAX):
         try:
-            y = int(ym[:4])
-            m = int(ym[4:6])
-        except Exception:
-            continue
-        if y in by_year:
-            by_year[y][m] = temp
-    wi_by_year = {}
-    if VERBOSE:
-        counts = {y: len(mdict) for y, mdict in by_year.items()}
-        print(f"MONTHS COUNT {counts}")
-    for y, months in by_year.items():
-        if len(months) == 0:
+            region = fetch_power_t2m_region(lat0, lat1, lon0, lon1, start_year, end_year)
+        except Exception as e:
+            logger.warning("ERROR FETCH region lat0=%.1f lon0=%.1f err=%s", lat0, lon0, e)
             continue
-        wi_by_year[y] = calculate_wi_from_monthly(months)
-    return wi_by_year
+        for feature in region.get("features", []):
+            try:
+                lon_f, lat_f = feature["geometry"]["coordinates"][:2]
+            except (KeyError, TypeError):
+                continue
+            t2m = extract_t2m(feature)
+            if t2m:
+                by_cell[(round(lat_f, 1), round(lon_f, 1))] = _t2m_vec(t2m)
 
+    results = []
+    missing = []
+    for lat, lon in points:
+        vec = by_cell.get((lat, lon))
+        if vec is not None:
+            cache_put_vector(lat, lon, vec)
+            results.append((lat, lon, vec, None))
+        else:
+            missing.append((lat, lon))
 
-def assign_zone(wi: float) -> str:
-    if wi < 15:
-        return "I"
-    if wi < 45:
-        return "II"
-    if wi < 85:
-        return "III"
-    if wi < 180:
-        return "IV"
-    if wi < 240:
-        return "V"
-    return "VI"
+    if missing:
+        print(f"Regional coverage: {len(results)}/{len(points)} points, falling back to point API for {len(missing)}")
+        if aiohttp is not None:
+            results.extend(asyncio.run(_fetch_all_async(missing, start_year, end_year)))
+        else:
+            results.extend(_fetch_all_threaded(missing, start_year, end_year))
+    return results
 
 
-def frange(start: float, stop: float, step: float):
-    v = start
-    eps = 1e-9
-    while v <= stop + eps:
-        yield round(v, 1)
-        v = round(v + step, 10)
+_QUEUE_SENTINEL = object()
 
 
-def generate_dataset():
-    data_by_year = {str(y): [] for y in YEARS}
+def _fetch_all_threaded(points, start_year, end_year):
+    """aiohttp非導入環境向けのスレッドプール並列フォールバック。戻り値は非同期版と同形式。
+
+    ネットワークI/O待ちの間はGILが解放されるため、requests + スレッドでも
+    プールサイズにほぼ比例してスケールする。SessionはGETに関してスレッドセーフ。
+    fetchスレッドは生レスポンスを有界キューへ渡すだけにし、JSON解析と
+    ベクトルキャッシュ更新は専用の消費スレッド1本で行う。これにより
+    解析が取得と重なり、全体は max(取得, 解析) に近づく。
+    """
+    results = []
+    results_q = queue.Queue(maxsize=256)
+
+    def fetch_one(lat, lon):
+        vec = cache_get_vector(lat, lon)
+        if vec is not None:
+            results_q.put((lat, lon, vec, None))
+            return
+        cache_file = _cache_path(lat, lon, start_year, end_year)
+        if cache_file.exists():
+            logger.debug("CACHE HIT lat=%.1f lon=%.1f", lat, lon)
+            results_q.put((lat, lon, cache_file.read_bytes(), None))
+            return
+        try:
+            raw = fetch_point_raw(lat, lon, start_year, end_year)
+            logger.debug("FETCH lat=%.1f lon=%.1f ok", lat, lon)
+            results_q.put((lat, lon, raw, None))
+        except Exception as e:
+            logger.debug("ERROR FETCH lat=%.1f lon=%.1f err=%s", lat, lon, e)
+            results_q.put((lat, lon, None, f"error:{e.__class__.__name__}"))
+
+    def consume():
+        start_ts = time.time()
+        done = 0
+        while True:
+            item = results_q.get()
+            if item is _QUEUE_SENTINEL:
+                return
+            lat, lon, payload, note = item
+            if isinstance(payload, (bytes, bytearray)):
+                try:
+                    payload = _t2m_vec(extract_t2m(json_loads(payload)))
+                    cache_put_vector(lat, lon, payload)
+                except Exception as e:
+                    payload, note = None, f"error:{e.__class__.__name__}"
+            results.append((lat, lon, payload, note))
+            done += 1
+            if done % 50 == 0 or done == len(points):
+                elapsed = time.time() - start_ts
+                rate = done / elapsed if elapsed > 0 else 0.0
+                eta = (len(points) - done) / rate if rate > 0 else float("inf")
+                print(f"Fetched: {done}/{len(points)}  rate {rate:6.1f} pts/s  ETA {eta:6.1f}s", end="\r", flush=True)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    with ThreadPoolExecutor(max_workers=THREAD_POOL_WORKERS) as ex:
+        futures = [ex.submit(fetch_one, lat, lon) for lat, lon in points]
+        for fut in as_completed(futures):
+            fut.result()  # fetch_one内で例外は処理済みだが念のため伝播させる
+    results_q.put(_QUEUE_SENTINEL)
+    consumer.join()
+    print()
+    return results
+
+
+def grid_points():
+    """対象bboxの格子点 (lat, lon) のリストを生成。linspaceでFPドリフトを回避。"""
     lat_count = int(round((LAT_MAX - LAT_MIN) / STEP)) + 1
     lon_count = int(round((LON_MAX - LON_MIN) / STEP)) + 1
-    total_points = lat_count * lon_count
+    lats = np.round(np.linspace(LAT_MIN, LAT_MAX, lat_count), 1)
+    lons = np.round(np.linspace(LON_MIN, LON_MAX, lon_count), 1)
+    ll = np.stack(np.meshgrid(lats, lons, indexing="ij"), axis=-1).reshape(-1, 2)
+    return [tuple(p) for p in ll.tolist()]
+
+
+def generate_dataset():
+    # 年ごとにSoA（列指向）で保持。点ごとの4キー辞書を作らないことで
+    # 構築時のアロケーションと出力JSONのキー繰り返しを省く。
+    data_by_year = {str(y): {"lat": [], "lon": [], "wi": [], "zone": []} for y in YEARS}
+    points = grid_points()
+    total_points = len(points)
+
+    # 隣接する要求点が同じPOWERセルに解決されるため、ユニークセルだけ取得して
+    # 結果を元の格子点へ展開する（STEPがネイティブ格子より細かいほど効く）
+    cell_of = {(lat, lon): (snap_to_cell(lat), snap_to_cell(lon)) for lat, lon in points}
+    unique_cells = sorted(set(cell_of.values()))
 
     print(f"Target bbox: lat {LAT_MIN}..{LAT_MAX}, lon {LON_MIN}..{LON_MAX}, step {STEP}°")
-    print(f"Years: {YEARS[0]}-{YEARS[-1]} | Total grid points: {total_points}")
+    print(f"Years: {YEARS[0]}-{YEARS[-1]} | Total grid points: {total_points} | Unique POWER cells: {len(unique_cells)}")
+
+    # 取得フェーズ：既定はregionalの一括取得、点単位は並列（async/スレッド）
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if USE_REGIONAL:
+        cell_results = _fetch_all_regional(unique_cells, YEARS[0], YEARS[-1])
+    elif aiohttp is not None:
+        cell_results = asyncio.run(_fetch_all_async(unique_cells, YEARS[0], YEARS[-1]))
+    else:
+        cell_results = _fetch_all_threaded(unique_cells, YEARS[0], YEARS[-1])
+
+    flush_vector_cache()
+
+    # セル単位の結果を要求格子点へファンアウト
+    by_cell = {(lat, lon): (vec, note) for lat, lon, vec, note in cell_results}
+    results = []
+    for lat, lon in points:
+        vec, note = by_cell.get(cell_of[(lat, lon)], (None, "missing_cell"))
+        results.append((lat, lon, vec, note))
 
-    # 失敗・欠損のCSV準備
+    # 集計フェーズ：全地点のT2Mベクトルをテンソルに積み、WIを一括計算
+    ok_points = []
+    ok_vecs = []
+    failures = []
+    for lat, lon, vec, note in results:
+        if vec is not None and not np.isnan(vec).all():
+            ok_points.append((lat, lon))
+            ok_vecs.append(vec)
+        else:
+            failures.append((lat, lon, note or "no_months"))
+
+    T = build_t2m_tensor(ok_vecs, YEARS[0], YEARS[-1])
+    wi_grid, zone_grid = wi_and_zone_from_tensor(T)  # NaN行は下で読み飛ばす
+
+    for p, (lat, lon) in enumerate(ok_points):
+        added_any = False
+        for yi, y in enumerate(YEARS):
+            wi = wi_grid[p, yi]
+            if np.isnan(wi):
+                continue
+            bucket = data_by_year[str(y)]
+            bucket["lat"].append(lat)
+            bucket["lon"].append(lon)
+            bucket["wi"].append(float(wi))
+            bucket["zone"].append(str(zone_grid[p, yi]))
+            added_any = True
+        if not added_any:
+            failures.append((lat, lon, "no_valid_years"))
+
+    # 失敗・欠損はメモリ上に溜めてから1回のopenでまとめて書く
     with FAIL_LOG.open("w", newline="", encoding="utf-8") as fcsv:
         writer = csv.writer(fcsv)
         writer.writerow(["lat", "lon", "note"])  # ヘッダ
-
-    processed = 0
-    start_ts = time.time()
-    last_persist_ts = start_ts
-
-    for lat in frange(LAT_MIN, LAT_MAX, STEP):
-        for lon in frange(LON_MIN, LON_MAX, STEP):
-            note = None
-            try:
-                power = fetch_power_t2m(lat, lon, YEARS[0], YEARS[-1])
-                wi_by_year = process_yearly_from_power(power)
-                if len(wi_by_year) == 0:
-                    note = "no_months"
-                added_any = False
-                for y in YEARS:
-                    wi = wi_by_year.get(y)
-                    if wi is None:
-                        continue
-                    zone = assign_zone(wi)
-                    data_by_year[str(y)].append({
-                        "lat": lat,
-                        "lon": lon,
-                        "wi": wi,
-                        "zone": zone,
-                    })
-                    added_any = True
-                if not added_any and note is None:
-                    note = "no_valid_years"
-            except Exception as e:
-                note = f"error:{e.__class__.__name__}"
-            if note:
-                with FAIL_LOG.open("a", newline="", encoding="utf-8") as fcsv:
-                    csv.writer(fcsv).writerow([lat, lon, note])
-
-            processed += 1
-
-            # 進行状況（ライブ1行更新）
-            if processed % 50 == 0 or processed == total_points:
-                elapsed = time.time() - start_ts
-                rate = processed / elapsed if elapsed > 0 else 0.0
-                remaining = total_points - processed
-                eta = remaining / rate if rate > 0 else float("inf")
-                percent = processed / total_points * 100.0
-                print(
-                    f"Progress: {processed}/{total_points} ({percent:5.1f}%)  "
-                    f"elapsed {elapsed:6.1f}s  rate {rate:6.1f} pts/s  ETA {eta:6.1f}s",
-                    end="\r",
-                    flush=True,
-                )
-
-            # 定期的に改行して履歴を残す
-            if time.time() - last_persist_ts > 30:
-                print()  # newline
-                last_persist_ts = time.time()
-
-    print()  # 最終行の改行
+        writer.writerows(failures)
     return {
         "metadata": {
             "test_mode": False,
@@ -198,7 +504,8 @@ def generate_dataset():
             "total_points": total_points,
             "generated_at": datetime.now().isoformat(),
             "region": "Japan_0.5deg",
-            "wi_method": "sum(max(T_month-5,0)) using NASA POWER T2M (monthly)",
+            "wi_method": f"sum(max(T_month-5,0)) using NASA POWER T2M (monthly), points snapped to {POWER_CELL_DEG}° native cells",
+            "data_format": "columnar: data[year] = {lat:[],lon:[],wi:[],zone:[]}",
             "source": POWER_BASE,
             "fail_log": str(FAIL_LOG.resolve()),
         },
@@ -206,13 +513,33 @@ def generate_dataset():
     }
 
 
+def write_dataset_stream(out_path: Path, metadata: dict, data_by_year: dict):
+    """データセットを年バケット単位で逐次書き出す。
+
+    全体を一度に直列化すると辞書とバッファで二重にメモリを持つため、
+    metadataと各年の配列を順にf.writeし、書き終えたバケットは解放する。
+    """
+    with out_path.open("wb") as f:
+        f.write(b'{"metadata":')
+        f.write(json_dumps_bytes(metadata))
+        f.write(b',"data":{')
+        for i, y in enumerate(list(data_by_year.keys())):
+            if i:
+                f.write(b",")
+            f.write(json_dumps_bytes(y))
+            f.write(b":")
+            f.write(json_dumps_bytes(data_by_year[y]))
+            data_by_year[y] = None  # 書き終えた年はGCへ
+        f.write(b"}}")
+
+
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
     out_path = Path("climate-map-app/public/climate-grid-0.1deg.json").resolve()
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     dataset = generate_dataset()
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(dataset, f, ensure_ascii=False, separators=(",", ":"))
+    write_dataset_stream(out_path, dataset["metadata"], dataset["data"])
 
     print(f"Written: {out_path}")
     print(f"Years: {dataset['metadata']['years_range']}  Resolution: {dataset['metadata']['resolution']}°  Points(year target): {dataset['metadata']['total_points']}")
@@ -0,0 +1,193 @@
+"""NASA POWER API共通クライアント。
+
+generate_grid_0_1deg.py と test_fetcher.py で重複していた取得・解析・
+温量指数まわりのロジックをここに集約する。Session再利用・orjson・
+ベクトル化WIなどの最適化は本モジュールに入れれば両スクリプトに効く。
+"""
+
+import json
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # orjsonが無ければstdlib jsonで代替
+    orjson = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # numbaが無ければNumPyベクトル化版で計算
+    njit = None
+
+POWER_BASE = "https://power.larc.nasa.gov/api/temporal/monthly/point"
+POWER_REGIONAL_BASE = "https://power.larc.nasa.gov/api/temporal/monthly/regional"
+POWER_PARAMS = {
+    "parameters": "T2M",
+    "community": "SB",
+    "format": "JSON",
+}
+TIMEOUT_SEC = 30
+
+# 全リクエストで共有するSession（keep-aliveでTCP/TLSハンドシェイクを使い回す）
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "climate-fetcher/1.0"})
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=64,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+        ),
+    ),
+)
+
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps_bytes(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def point_params(lat: float, lon: float, start_year: int, end_year: int) -> dict:
+    return {
+        **POWER_PARAMS,
+        "longitude": lon,
+        "latitude": lat,
+        "start": start_year,
+        "end": end_year,
+    }
+
+
+def fetch_point_raw(lat: float, lon: float, start_year: int, end_year: int,
+                    *, session: requests.Session = None, timeout: int = TIMEOUT_SEC) -> bytes:
+    """point APIのレスポンスボディを未解析のbytesのまま返す。失敗時は例外。
+
+    取得スレッドと解析側を分離するパイプライン向け。
+    """
+    s = session if session is not None else SESSION
+    r = s.get(POWER_BASE, params=point_params(lat, lon, start_year, end_year), timeout=timeout)
+    r.raise_for_status()
+    return r.content
+
+
+def fetch_point(lat: float, lon: float, start_year: int, end_year: int,
+                *, session: requests.Session = None, timeout: int = TIMEOUT_SEC) -> dict:
+    """point APIで1地点分の月別T2Mレスポンス(JSON)を取得。失敗時は例外。"""
+    return json_loads(fetch_point_raw(lat, lon, start_year, end_year, session=session, timeout=timeout))
+
+
+def extract_t2m(power_json: dict):
+    """POWERレスポンス（point/regionalのfeatureとも）からT2M辞書を取り出す。"""
+    if not power_json or "properties" not in power_json or "parameter" not in power_json["properties"]:
+        return None
+    return power_json["properties"]["parameter"].get("T2M", {})
+
+
+def t2m_vector(t2m: dict, start_year: int, end_year: int) -> np.ndarray:
+    """月別T2M辞書を長さ (年数)*12 のfloat32ベクトルへ展開。欠損はNaN。"""
+    n_years = end_year - start_year + 1
+    vec = np.full(n_years * 12, np.nan, dtype=np.float32)
+    for ym, temp in t2m.items():
+        if temp is None:
+            continue
+        try:
+            y = int(ym[:4])
+            m = int(ym[4:6])
+        except Exception:
+            continue
+        if start_year <= y <= end_year and 1 <= m <= 12:
+            vec[(y - start_year) * 12 + m - 1] = temp
+    return vec
+
+
+def build_t2m_tensor(vectors, start_year: int, end_year: int) -> np.ndarray:
+    """T2Mベクトルの列を形状 (地点, 年数, 12) のfloat32テンソルへ積む。"""
+    n_years = end_year - start_year + 1
+    if not vectors:
+        return np.empty((0, n_years, 12), dtype=np.float32)
+    return np.stack(vectors).reshape(len(vectors), n_years, 12)
+
+
+def wi_from_monthly(monthly: dict) -> float:
+    """月平均気温辞書から温量指数（sum(max(T-5,0))）をスカラで算出。"""
+    wi = 0.0
+    for temp in monthly.values():
+        if temp is not None and temp > 5.0:
+            wi += (temp - 5.0)
+    return round(wi, 1)
+
+
+def wi_from_tensor(T: np.ndarray) -> np.ndarray:
+    """温量指数 sum(max(T-5,0)) を (地点, 年, 12) テンソル全体で一括計算。
+
+    月データ皆無の(地点, 年)はNaN。
+    """
+    wi = np.where(np.isnan(T), 0.0, np.maximum(T - 5.0, 0.0)).sum(axis=2, dtype=np.float64)
+    wi = np.round(wi, 1)
+    has_months = (~np.isnan(T)).any(axis=2)
+    return np.where(has_months, wi, np.nan)
+
+
+# 温量指数→気候区分の境界値と区分ラベル（searchsortedで分岐なし判定）
+_BINS = np.array([15.0, 45.0, 85.0, 180.0, 240.0], dtype=np.float32)
+_ZONES = np.array(["I", "II", "III", "IV", "V", "VI"])
+
+
+def zone_from_wi(wi):
+    """温量指数から気候区分を判定。スカラでもndarrayでも可。"""
+    return _ZONES[np.searchsorted(_BINS, wi, side="right")]
+
+
+def assign_zone(wi: float) -> str:
+    return str(zone_from_wi(wi))
+
+
+if njit is not None:
+    # fastmathはNaN無しを仮定してisnanガードを消し込むため使わない
+    @njit(parallel=True, cache=True)
+    def _wi_months_kernel(T):
+        """max(T-5,0)の月次集約をコンパイル済みループで実行。(wi, 有効月数)を返す。"""
+        P, Y, M = T.shape
+        wi = np.zeros((P, Y), dtype=np.float64)
+        months = np.zeros((P, Y), dtype=np.int8)
+        for p in prange(P):
+            for y in range(Y):
+                s = 0.0
+                n = 0
+                for m in range(M):
+                    t = T[p, y, m]
+                    if not np.isnan(t):
+                        n += 1
+                        if t > 5.0:
+                            s += t - 5.0
+                wi[p, y] = s
+                months[p, y] = n
+        return wi, months
+
+
+def wi_and_zone_from_tensor(T: np.ndarray):
+    """温量指数と気候区分をまとめて計算。numbaがあればJITカーネルで集約する。
+
+    区分は丸め後のWIに対して判定し、境界挙動をNumPy版と揃える。
+    """
+    if njit is not None:
+        wi, months = _wi_months_kernel(T)
+        wi = np.where(months > 0, np.round(wi, 1), np.nan)
+    else:
+        wi = wi_from_tensor(T)
+    zone = zone_from_wi(np.nan_to_num(wi))
+    return wi, zone
@@ -290,7 +290,13 @@ const ClimateMap = () => {
     "VI": { color: "#7c2d12", label: "熱帯", range: "> 240" }
   }), []);
 
-  const currentData = useMemo(() => (climateData?.data[currentYear.toString()] || []), [climateData, currentYear]);
+  const currentData = useMemo(() => {
+    const bucket = climateData?.data[currentYear.toString()];
+    if (!bucket) return [];
+    if (Array.isArray(bucket)) return bucket; // 旧形式（行指向）
+    // 新形式（列指向: {lat:[],lon:[],wi:[],zone:[]}）を行に展開
+    return bucket.lat.map((lat, i) => ({ lat, lon: bucket.lon[i], wi: bucket.wi[i], zone: bucket.zone[i] }));
+  }, [climateData, currentYear]);
 
   if (loading) {
     return (
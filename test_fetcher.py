@@ -1,16 +1,15 @@
-import requests
 import json
 import time
 from datetime import datetime
 import os
 
+import power_client
+
 class JapanClimateTestFetcher:
     def __init__(self):
-        self.base_url = "https://power.larc.nasa.gov/api/temporal/monthly/point"
-        self.parameters = "T2M"  # 2m気温
-        self.community = "SB"   # Sustainable Buildings (RE→SBに変更)
-        self.format = "JSON"
-        
+        # 取得・解析・WI計算はpower_clientに集約（Session再利用もそちら側）
+        self.session = power_client.SESSION
+
         # テスト用：関東地方のみ（約3×3=9地点）
         self.lat_min, self.lat_max = 35.0, 37.0
         self.lon_min, self.lon_max = 139.0, 141.0
@@ -38,73 +37,41 @@ class JapanClimateTestFetcher:
         return points
     
     def fetch_temperature_data(self, lat, lon):
-        """指定地点の気温データを取得"""
-        # URLパラメータを修正
-        url = f"{self.base_url}?parameters={self.parameters}&community={self.community}&longitude={lon}&latitude={lat}&start={self.start_year}&end={self.end_year}&format={self.format}"
-        
+        """指定地点の気温データを取得（power_client経由）"""
         print(f"  API呼び出し: 北緯{lat}度, 東経{lon}度")
-        print(f"  URL: {url}")  # デバッグ用
-        
+
         try:
-            response = requests.get(url, timeout=30)
-            print(f"  レスポンスコード: {response.status_code}")  # デバッグ用
-            
-            if response.status_code != 200:
-                print(f"  レスポンス内容: {response.text[:200]}...")  # エラー詳細
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'properties' in data and 'parameter' in data['properties']:
-                temp_data = data['properties']['parameter']['T2M']
-                print(f"  ✓ データ取得成功: {len(temp_data)}ヶ月分")
-                return temp_data
-            else:
-                print(f"  ✗ データなし")
-                print(f"  レスポンス構造: {list(data.keys()) if data else 'None'}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
+            data = power_client.fetch_point(lat, lon, self.start_year, self.end_year, session=self.session)
+        except Exception as e:
             print(f"  ✗ API エラー: {e}")
             return None
-        except json.JSONDecodeError as e:
-            print(f"  ✗ JSON エラー: {e}")
+
+        temp_data = power_client.extract_t2m(data)
+        if temp_data:
+            print(f"  ✓ データ取得成功: {len(temp_data)}ヶ月分")
+            return temp_data
+        else:
+            print(f"  ✗ データなし")
+            print(f"  レスポンス構造: {list(data.keys()) if data else 'None'}")
             return None
-    
+
     def calculate_warmth_index(self, monthly_temps):
         """月平均気温から温量指数を計算"""
         if not monthly_temps:
             return None
-        
-        warmth_index = 0
-        valid_months = 0
-        
-        for temp in monthly_temps.values():
-            if temp is not None:
-                valid_months += 1
-                if temp > 5:
-                    warmth_index += (temp - 5)
-        
-        print(f"    有効月数: {valid_months}, 温量指数: {round(warmth_index, 1)}")
-        return round(warmth_index, 1)
-    
+
+        valid_months = sum(1 for temp in monthly_temps.values() if temp is not None)
+        warmth_index = power_client.wi_from_monthly(monthly_temps)
+
+        print(f"    有効月数: {valid_months}, 温量指数: {warmth_index}")
+        return warmth_index
+
     def determine_climate_zone(self, warmth_index):
         """温量指数から気候区分を判定"""
         if warmth_index is None:
             return None
-        elif warmth_index < 15:
-            return "I"    # 亜寒帯
-        elif warmth_index < 45:
-            return "II"   # 冷温帯
-        elif warmth_index < 85:
-            return "III"  # 中間温帯
-        elif warmth_index < 180:
-            return "IV"   # 暖温帯
-        elif warmth_index < 240:
-            return "V"    # 亜熱帯
-        else:
-            return "VI"   # 熱帯
-    
+        return power_client.assign_zone(warmth_index)
+
     def process_yearly_data(self, temp_data):
         """年度別に温量指数と気候区分を計算"""
         yearly_results = {}